@@ -0,0 +1,121 @@
+"""
+Shared helpers for reading conda environment YAML files, including the
+conda-env/env-*.yml files that define the image.
+"""
+
+import os
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple, Union
+
+import yaml
+
+# Prefer the LibYAML-backed loader; fall back to the pure-Python one if
+# PyYAML was built without LibYAML.
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
+# Characters that start a version specifier in a dependency string
+_VER_CHARS = '=<>!~'
+
+
+def dependency_name(dep: str) -> str:
+    """
+    Extract the package name from a dependency string (e.g. 'xarray>=2024.10').
+
+    Returns:
+        Package name with any version specifier removed
+    """
+    # str.find is a C-level scan; most deps have no specifier at all
+    pos = -1
+    for c in _VER_CHARS:
+        i = dep.find(c)
+        if i != -1 and (pos == -1 or i < pos):
+            pos = i
+    return (dep if pos == -1 else dep[:pos]).strip()
+
+
+def parse_env_deps(path: Union[Path, os.DirEntry]) -> Set[str]:
+    """
+    Parse a conda environment file and extract conda and pip package names.
+
+    Accepts a Path or an os.DirEntry from os.scandir, so callers that list a
+    directory can open each file through its entry.
+
+    Raises:
+        yaml.YAMLError: If the file is not valid YAML
+
+    Returns:
+        Set of package names
+    """
+    packages = set()
+
+    with open(path, 'rb') as f:
+        data = yaml.load(f, Loader=SafeLoader)
+
+    if data and 'dependencies' in data:
+        # A bare 'dependencies:' key loads as None
+        for dep in data['dependencies'] or []:
+            if isinstance(dep, str):
+                pkg_name = dependency_name(dep)
+                if pkg_name:
+                    packages.add(pkg_name)
+            elif isinstance(dep, dict) and 'pip' in dep:
+                # Handle pip dependencies
+                for pip_dep in dep['pip'] or []:
+                    pkg_name = dependency_name(pip_dep)
+                    if pkg_name:
+                        packages.add(pkg_name)
+
+    return packages
+
+
+def find_env_ymls(env_dir: Path) -> List[os.DirEntry]:
+    """
+    Find env-*.yml files in env_dir.
+
+    Uses os.scandir, whose entries carry cached file type information, rather
+    than a pathlib glob.
+
+    Returns:
+        Directory entries sorted by filename
+    """
+    if not env_dir.is_dir():
+        return []
+
+    with os.scandir(env_dir) as it:
+        return sorted((entry for entry in it
+                       if entry.is_file() and entry.name.startswith('env-')
+                       and entry.name.endswith('.yml')),
+                      key=lambda entry: entry.name)
+
+
+def _parse_env_file(env_file: os.DirEntry) -> Tuple[str, Optional[Set[str]]]:
+    """
+    Parse a single env-*.yml file and extract Python package names.
+
+    Returns:
+        Tuple of (filename, set of package names), or (filename, None) if the
+        file could not be parsed
+    """
+    try:
+        return env_file.name, parse_env_deps(env_file)
+    except yaml.YAMLError as e:
+        print(f"Error parsing {env_file.path}: {e}", file=sys.stderr)
+        return env_file.name, None
+
+
+def parse_env_files(repo_root: Path) -> Dict[str, Set[str]]:
+    """
+    Parse all env-*.yml files and extract Python package names.
+
+    Returns:
+        Dictionary mapping filename to set of package names
+    """
+    env_dir = repo_root / "conda-env"
+    results = (_parse_env_file(env_file) for env_file in find_env_ymls(env_dir))
+
+    # Files that failed to parse are skipped
+    return {name: packages for name, packages in results if packages is not None}
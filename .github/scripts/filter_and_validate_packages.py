@@ -13,20 +13,62 @@ This script:
 7. Writes results to build.log
 """
 
+import argparse
+import os
 import sys
 import yaml
 import re
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Set, Dict, List, Tuple
+from typing import AbstractSet, Set, Dict, List, Tuple
 
+from env_yaml_utils import SafeLoader, dependency_name, parse_env_files
 
-def fetch_pangeo_feedstock_dependencies(package_name: str, version: str) -> Set[str]:
+# Version number following a specifier, e.g. the '2026.01.21' in 'pangeo-notebook=2026.01.21'
+_VERSION_SPEC_RE = re.compile(r'[>=<~!]=?([0-9.]+)')
+
+# Feedstock dependencies to fall back on when meta.yaml cannot be fetched
+_FALLBACK_FEEDSTOCK_DEPENDENCIES = {
+    'pangeo-notebook': frozenset({
+        'pangeo-dask',
+        'dask-labextension',
+        'ipywidgets',
+        'jupyter-server-proxy',
+        'jupyterhub-singleuser',
+        'jupyterlab',
+        'nbgitpuller',
+    }),
+    'pangeo-dask': frozenset({
+        'dask',
+        'distributed',
+        'dask-gateway',
+    }),
+}
+
+# Jinja2 statements, comments and expressions in conda-forge meta.yaml files
+_JINJA_RE = re.compile(r'\{%.*?%\}|\{#.*?#\}|\{\{.*?\}\}', re.DOTALL)
+
+# Plain-scalar token that stands in for a {{ ... }} expression, so text around
+# the expression still parses (e.g. '- {{ name }}-base =={{ version }}')
+_JINJA_PLACEHOLDER = '__jinja__'
+
+
+def fetch_pangeo_feedstock_dependencies(package_name: str, version: str,
+                                        use_cache: bool = True) -> AbstractSet[str]:
     """
     Fetch dependencies from pangeo feedstock meta.yaml on GitHub.
     
+    Fetched meta.yaml files that parse successfully are cached on disk keyed by
+    (package_name, version) so repeat runs do not hit the network. The cache
+    lives in $GITHUB_ACTIONS_CACHE if set, otherwise ~/.cache/py-rocket-feedstock.
+    The workflows do not persist either directory between jobs, so this only
+    helps local runs; CI always fetches.
+    
     Args:
         package_name: Name of the pangeo package (e.g., 'pangeo-notebook', 'pangeo-dask')
         version: Version string from the environment file
+        use_cache: Reuse a previously cached meta.yaml instead of fetching it
     
     Returns:
         Set of package names that are dependencies
@@ -38,44 +80,46 @@ def fetch_pangeo_feedstock_dependencies(package_name: str, version: str) -> Set[
     feedstock_name = f"{package_name}-feedstock"
     url = f"https://raw.githubusercontent.com/conda-forge/{feedstock_name}/main/recipe/meta.yaml"
     
+    cache_root = os.environ.get('GITHUB_ACTIONS_CACHE')
+    cache_dir = Path(cache_root) if cache_root else Path.home() / '.cache' / 'py-rocket-feedstock'
+    cache_path = cache_dir / f"{package_name}-{version}.yaml"
+    
     dependencies = set()
     
     try:
-        with urllib.request.urlopen(url, timeout=10) as response:
-            content = response.read().decode('utf-8')
-            
-            # Parse the meta.yaml content
-            # Look for the requirements: run: section
-            in_requirements = False
-            in_run_section = False
-            
-            for line in content.split('\n'):
-                stripped = line.strip()
-                
-                # Detect requirements section
-                if stripped.startswith('requirements:'):
-                    in_requirements = True
-                    continue
-                
-                # Within requirements, detect run section
-                if in_requirements and stripped.startswith('run:'):
-                    in_run_section = True
-                    continue
-                
-                # End of run section (new top-level key or another subsection at same indent level)
-                if in_run_section and stripped and not stripped.startswith('-') and not stripped.startswith('#'):
-                    # Check if it's a new section (contains ':' and not indented with spaces)
-                    if ':' in stripped and not line.startswith('  '):
-                        break
-                
-                # Extract package names from run section
-                if in_run_section and stripped.startswith('-'):
-                    # Remove leading dash and any version constraints
-                    pkg = stripped.lstrip('- ').strip()
-                    # Extract package name (before version specifiers or spaces)
-                    pkg_name = re.split(r'[>=<~!=\s]', pkg)[0].strip()
-                    if pkg_name and not pkg_name.startswith('{'):
-                        dependencies.add(pkg_name)
+        from_cache = use_cache and cache_path.is_file() and cache_path.stat().st_size > 0
+        if from_cache:
+            content = cache_path.read_text(encoding='utf-8')
+            print(f"  Using cached {package_name} feedstock: {cache_path}")
+        else:
+            with urllib.request.urlopen(url, timeout=10) as response:
+                content = response.read().decode('utf-8')
+        
+        # meta.yaml is a Jinja2 template; drop {% ... %} / {# ... #} blocks and
+        # replace {{ ... }} expressions with a placeholder so the remainder
+        # parses as YAML
+        sanitized = _JINJA_RE.sub(
+            lambda m: _JINJA_PLACEHOLDER if m.group(0).startswith('{{') else '', content)
+        data = yaml.load(sanitized, Loader=SafeLoader) or {}
+        run_requirements = (data.get('requirements') or {}).get('run') or []
+        
+        for req in run_requirements:
+            if not isinstance(req, str):
+                continue
+            # Extract package name (before version specifiers or spaces)
+            tokens = req.split(None, 1)
+            pkg_name = dependency_name(tokens[0]) if tokens else ''
+            # Skip requirements whose name comes from a template expression
+            if pkg_name and _JINJA_PLACEHOLDER not in pkg_name:
+                dependencies.add(pkg_name)
+        
+        # Only cache a meta.yaml that parsed, so a bad fetch is retried next run
+        if not from_cache:
+            try:
+                cache_dir.mkdir(parents=True, exist_ok=True)
+                cache_path.write_bytes(content.encode('utf-8'))
+            except OSError as e:
+                print(f"  Warning: Could not cache {package_name} feedstock: {e}", file=sys.stderr)
         
         print(f"  Fetched {len(dependencies)} dependencies from {package_name} feedstock")
         
@@ -84,27 +128,13 @@ def fetch_pangeo_feedstock_dependencies(package_name: str, version: str) -> Set[
         print(f"  Using fallback hardcoded dependencies", file=sys.stderr)
         
         # Fallback to hardcoded values if fetch fails
-        if package_name == 'pangeo-notebook':
-            dependencies = {
-                'pangeo-dask',
-                'dask-labextension',
-                'ipywidgets',
-                'jupyter-server-proxy',
-                'jupyterhub-singleuser',
-                'jupyterlab',
-                'nbgitpuller'
-            }
-        elif package_name == 'pangeo-dask':
-            dependencies = {
-                'dask',
-                'distributed',
-                'dask-gateway'
-            }
+        dependencies = _FALLBACK_FEEDSTOCK_DEPENDENCIES.get(package_name, dependencies)
     
     return dependencies
 
 
-def parse_base_environment(base_env_file: Path) -> Tuple[Set[str], Set[str], Set[str]]:
+def parse_base_environment(base_env_file: Path,
+                           use_cache: bool = True) -> Tuple[AbstractSet[str], AbstractSet[str], Set[str]]:
     """
     Parse py-rocket-base environment.yaml and extract Python package names.
     This includes packages from pangeo-notebook and pangeo-dask feedstocks,
@@ -125,20 +155,20 @@ def parse_base_environment(base_env_file: Path) -> Tuple[Set[str], Set[str], Set
         print(f"Warning: {base_env_file} not found", file=sys.stderr)
         return pangeo_notebook_packages, pangeo_dask_packages, set()
     
-    with open(base_env_file, 'r') as f:
+    with open(base_env_file, 'rb') as f:
         try:
-            data = yaml.safe_load(f)
+            data = yaml.load(f, Loader=SafeLoader)
             
             if data and 'dependencies' in data:
                 for dep in data['dependencies']:
                     if isinstance(dep, str):
                         # Extract package name (before version specifiers)
-                        pkg_name = re.split(r'[>=<~!]', dep)[0].strip()
+                        pkg_name = dependency_name(dep)
                         
                         # Check if this is pangeo-notebook to get its version
                         if pkg_name == 'pangeo-notebook':
                             # Extract version
-                            version_match = re.search(r'[>=<~!]=?([0-9.]+)', dep)
+                            version_match = _VERSION_SPEC_RE.search(dep)
                             if version_match:
                                 pangeo_notebook_version = version_match.group(1)
                         
@@ -148,7 +178,7 @@ def parse_base_environment(base_env_file: Path) -> Tuple[Set[str], Set[str], Set
                     elif isinstance(dep, dict) and 'pip' in dep:
                         # Handle pip dependencies
                         for pip_dep in dep['pip']:
-                            pkg_name = re.split(r'[>=<~!]', pip_dep)[0].strip()
+                            pkg_name = dependency_name(pip_dep)
                             if pkg_name:
                                 all_base_packages.add(pkg_name)
             
@@ -156,13 +186,18 @@ def parse_base_environment(base_env_file: Path) -> Tuple[Set[str], Set[str], Set
             print(f"Error parsing {base_env_file}: {e}", file=sys.stderr)
             return set(), set(), set()
     
-    # Fetch dependencies from pangeo-notebook feedstock
-    print("Fetching pangeo-notebook feedstock dependencies...")
-    pangeo_notebook_packages = fetch_pangeo_feedstock_dependencies('pangeo-notebook', pangeo_notebook_version or '2026.01.21')
-    
-    # Fetch dependencies from pangeo-dask feedstock (it's included in pangeo-notebook)
-    print("Fetching pangeo-dask feedstock dependencies...")
-    pangeo_dask_packages = fetch_pangeo_feedstock_dependencies('pangeo-dask', pangeo_notebook_version or '2026.01.21')
+    # Fetch dependencies from the pangeo-notebook and pangeo-dask feedstocks
+    # (pangeo-dask is included in pangeo-notebook). Both are network-bound, so
+    # fetch them concurrently.
+    feedstock_version = pangeo_notebook_version or '2026.01.21'
+    print("Fetching pangeo-notebook and pangeo-dask feedstock dependencies...")
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        notebook_future = executor.submit(fetch_pangeo_feedstock_dependencies,
+                                          'pangeo-notebook', feedstock_version, use_cache)
+        dask_future = executor.submit(fetch_pangeo_feedstock_dependencies,
+                                      'pangeo-dask', feedstock_version, use_cache)
+        pangeo_notebook_packages = notebook_future.result()
+        pangeo_dask_packages = dask_future.result()
     
     # Remove pangeo-notebook and pangeo-dask from all_base_packages since they're meta-packages
     all_base_packages.discard('pangeo-notebook')
@@ -174,46 +209,6 @@ def parse_base_environment(base_env_file: Path) -> Tuple[Set[str], Set[str], Set
     return pangeo_notebook_packages, pangeo_dask_packages, other_base_packages
 
 
-def parse_env_files(repo_root: Path) -> Dict[str, Set[str]]:
-    """
-    Parse all env-*.yml files and extract Python package names.
-    
-    Returns:
-        Dictionary mapping filename to set of package names
-    """
-    env_dir = repo_root / "conda-env"
-    env_files = sorted(env_dir.glob("env-*.yml"))
-    packages_by_file = {}
-    
-    for env_file in env_files:
-        with open(env_file, 'r') as f:
-            try:
-                data = yaml.safe_load(f)
-                packages = set()
-                
-                if data and 'dependencies' in data:
-                    for dep in data['dependencies']:
-                        if isinstance(dep, str):
-                            # Extract package name (before version specifiers)
-                            pkg_name = re.split(r'[>=<~!]', dep)[0].strip()
-                            if pkg_name:
-                                packages.add(pkg_name)
-                        elif isinstance(dep, dict) and 'pip' in dep:
-                            # Handle pip dependencies
-                            for pip_dep in dep['pip']:
-                                pkg_name = re.split(r'[>=<~!]', pip_dep)[0].strip()
-                                if pkg_name:
-                                    packages.add(pkg_name)
-                
-                packages_by_file[env_file.name] = packages
-                
-            except yaml.YAMLError as e:
-                print(f"Error parsing {env_file}: {e}", file=sys.stderr)
-                continue
-    
-    return packages_by_file
-
-
 def read_pinned_packages(pinned_file: Path) -> Tuple[Dict[str, str], List[str]]:
     """
     Parse packages-python-pinned.yaml to extract package names and full lines.
@@ -225,25 +220,27 @@ def read_pinned_packages(pinned_file: Path) -> Tuple[Dict[str, str], List[str]]:
     header_lines = []
     in_header = True
     
-    with open(pinned_file, 'r') as f:
-        for line in f:
-            stripped = line.strip()
-            
-            # Check if this is a package line (has '=' in it)
-            if '=' in stripped and not stripped.startswith('#'):
-                in_header = False
-                # Extract package name (before first '=')
-                pkg_name = stripped.split('=')[0].strip()
-                if pkg_name:
-                    packages[pkg_name] = line.rstrip('\n')
-                continue
-            
-            # Keep only leading header comments (before any packages)
-            # Skip section headers like "# Packages from..."
-            if in_header and (stripped.startswith('#') or not stripped):
-                # Only keep top-level header, not section headers
-                if not any(x in stripped.lower() for x in ['packages from', 'feedstock', 'environment']):
-                    header_lines.append(line)
+    # Work on raw bytes and only decode the slices that are kept
+    for line in pinned_file.read_bytes().splitlines():
+        stripped = line.strip()
+        
+        # Check if this is a package line (has '=' in it)
+        if b'=' in stripped and not stripped.startswith(b'#'):
+            in_header = False
+            # Extract package name (before first '=')
+            pkg_name = stripped.split(b'=', 1)[0].strip()
+            if pkg_name:
+                packages[pkg_name.decode('utf-8')] = line.decode('utf-8')
+            continue
+        
+        # Keep only leading header comments (before any packages)
+        # Skip section headers like "# Packages from..."
+        if in_header and (stripped.startswith(b'#') or not stripped):
+            # Only keep top-level header, not section headers
+            lowered = stripped.lower()
+            if (b'packages from' not in lowered and b'feedstock' not in lowered
+                    and b'environment' not in lowered):
+                header_lines.append(line.decode('utf-8') + '\n')
     
     return packages, header_lines
 
@@ -257,34 +254,25 @@ def write_filtered_packages(pinned_file: Path, header_lines: List[str],
     Write filtered packages back to packages-python-pinned.yaml.
     Organizes output with separate sections for pangeo feedstocks and other base packages.
     """
-    with open(pinned_file, 'w') as f:
-        # Write header
-        for line in header_lines:
-            f.write(line)
-        
-        # Write pangeo-notebook feedstock packages
-        if pangeo_notebook_packages:
-            f.write('\n# Packages from pangeo-notebook feedstock\n')
-            for pkg_name in sorted(pangeo_notebook_packages.keys()):
-                f.write(pangeo_notebook_packages[pkg_name] + '\n')
-        
-        # Write pangeo-dask feedstock packages
-        if pangeo_dask_packages:
-            f.write('\n# Packages from pangeo-dask feedstock\n')
-            for pkg_name in sorted(pangeo_dask_packages.keys()):
-                f.write(pangeo_dask_packages[pkg_name] + '\n')
-        
-        # Write other py-rocket-base packages
-        if other_base_packages:
-            f.write('\n# Other packages from py-rocket-base environment.yaml\n')
-            for pkg_name in sorted(other_base_packages.keys()):
-                f.write(other_base_packages[pkg_name] + '\n')
-        
-        # Write env-*.yml packages
-        if env_packages:
-            f.write('\n# Packages from conda-env/env-*.yml files\n')
-            for pkg_name in sorted(env_packages.keys()):
-                f.write(env_packages[pkg_name] + '\n')
+    sections = [
+        ('Packages from pangeo-notebook feedstock', pangeo_notebook_packages),
+        ('Packages from pangeo-dask feedstock', pangeo_dask_packages),
+        ('Other packages from py-rocket-base environment.yaml', other_base_packages),
+        ('Packages from conda-env/env-*.yml files', env_packages),
+    ]
+    
+    # Build the whole file in memory and write it once
+    parts = list(header_lines)
+    for title, packages in sections:
+        if packages:
+            parts.append(f'\n# {title}\n')
+            parts.extend(line + '\n' for _, line in sorted(packages.items()))
+    
+    # Write to a temporary file and rename it into place so an interrupted run
+    # never leaves a truncated pinned file behind
+    tmp_file = pinned_file.with_suffix('.yaml.tmp')
+    tmp_file.write_text(''.join(parts), encoding='utf-8')
+    os.replace(tmp_file, pinned_file)
 
 
 def write_build_log(log_file: Path, success: bool, missing_packages: Set[str],
@@ -296,56 +284,70 @@ def write_build_log(log_file: Path, success: bool, missing_packages: Set[str],
     """
     Write build.log with validation results.
     """
-    with open(log_file, 'w') as f:
-        f.write("=" * 70 + "\n")
-        f.write("Python Package Validation Report\n")
-        f.write("=" * 70 + "\n\n")
+    # Build the whole report in memory and write it once
+    parts = []
+    parts.append("=" * 70 + "\n")
+    parts.append("Python Package Validation Report\n")
+    parts.append("=" * 70 + "\n\n")
+    
+    parts.append(f"Packages from pangeo-notebook feedstock: {total_pangeo_notebook}\n")
+    parts.append(f"Packages from pangeo-dask feedstock: {total_pangeo_dask}\n")
+    parts.append(f"Other packages from py-rocket-base: {total_other_base}\n")
+    parts.append(f"Total packages from py-rocket-base: {total_pangeo_notebook + total_pangeo_dask + total_other_base}\n")
+    parts.append(f"Total unique packages in env-*.yml files: {total_env_packages}\n")
+    parts.append(f"Total packages in filtered packages-python-pinned.yaml: {total_pinned}\n\n")
+    
+    if success:
+        parts.append("STATUS: SUCCESS\n")
+        parts.append("=" * 70 + "\n\n")
+        parts.append("All Python packages from py-rocket-base environment.yaml and\n")
+        parts.append("env-*.yml files are present in the container image and have been\n")
+        parts.append("pinned in packages-python-pinned.yaml.\n\n")
+        parts.append("The pinned file includes:\n")
+        parts.append("  - Packages from pangeo-notebook feedstock\n")
+        parts.append("  - Packages from pangeo-dask feedstock\n")
+        parts.append("  - Other packages from py-rocket-base\n")
+        parts.append("  - Packages from conda-env/env-*.yml files\n")
+        parts.append("\nNot all 900+ packages from the conda environment are included.\n")
+    else:
+        parts.append("STATUS: FAILED\n")
+        parts.append("=" * 70 + "\n\n")
+        parts.append("The following packages are in env-*.yml or py-rocket-base files\n")
+        parts.append("but were NOT found in the container image:\n\n")
         
-        f.write(f"Packages from pangeo-notebook feedstock: {total_pangeo_notebook}\n")
-        f.write(f"Packages from pangeo-dask feedstock: {total_pangeo_dask}\n")
-        f.write(f"Other packages from py-rocket-base: {total_other_base}\n")
-        f.write(f"Total packages from py-rocket-base: {total_pangeo_notebook + total_pangeo_dask + total_other_base}\n")
-        f.write(f"Total unique packages in env-*.yml files: {total_env_packages}\n")
-        f.write(f"Total packages in filtered packages-python-pinned.yaml: {total_pinned}\n\n")
+        # Map each package to the env files that list it
+        origins = defaultdict(list)
+        for fname, pkgs in packages_by_file.items():
+            for p in pkgs:
+                origins[p].append(fname)
         
-        if success:
-            f.write("STATUS: SUCCESS\n")
-            f.write("=" * 70 + "\n\n")
-            f.write("All Python packages from py-rocket-base environment.yaml and\n")
-            f.write("env-*.yml files are present in the container image and have been\n")
-            f.write("pinned in packages-python-pinned.yaml.\n\n")
-            f.write("The pinned file includes:\n")
-            f.write("  - Packages from pangeo-notebook feedstock\n")
-            f.write("  - Packages from pangeo-dask feedstock\n")
-            f.write("  - Other packages from py-rocket-base\n")
-            f.write("  - Packages from conda-env/env-*.yml files\n")
-            f.write("\nNot all 900+ packages from the conda environment are included.\n")
-        else:
-            f.write("STATUS: FAILED\n")
-            f.write("=" * 70 + "\n\n")
-            f.write("The following packages are in env-*.yml or py-rocket-base files\n")
-            f.write("but were NOT found in the container image:\n\n")
-            
-            for pkg in sorted(missing_packages):
-                sources = [fname for fname, pkgs in packages_by_file.items() if pkg in pkgs]
-                f.write(f"  - {pkg}\n")
-                if sources:
-                    f.write(f"    Found in: {', '.join(sources)}\n")
-                else:
-                    f.write(f"    Found in: py-rocket-base environment.yaml\n")
-            
-            f.write(f"\nTotal missing packages: {len(missing_packages)}\n\n")
-            f.write("To resolve this issue:\n")
-            f.write("  1. Check if these packages failed to install in the container\n")
-            f.write("  2. Review the container build logs for errors\n")
-            f.write("  3. Fix any installation issues and rebuild the container\n")
-            f.write("  4. If packages are not needed, remove them from the respective files\n")
+        for pkg in sorted(missing_packages):
+            sources = origins.get(pkg, [])
+            parts.append(f"  - {pkg}\n")
+            if sources:
+                parts.append(f"    Found in: {', '.join(sources)}\n")
+            else:
+                parts.append(f"    Found in: py-rocket-base environment.yaml\n")
         
-        f.write("\n" + "=" * 70 + "\n")
+        parts.append(f"\nTotal missing packages: {len(missing_packages)}\n\n")
+        parts.append("To resolve this issue:\n")
+        parts.append("  1. Check if these packages failed to install in the container\n")
+        parts.append("  2. Review the container build logs for errors\n")
+        parts.append("  3. Fix any installation issues and rebuild the container\n")
+        parts.append("  4. If packages are not needed, remove them from the respective files\n")
+    
+    parts.append("\n" + "=" * 70 + "\n")
+    
+    log_file.write_text(''.join(parts), encoding='utf-8')
 
 
 def main():
     """Main function to filter and validate packages."""
+    parser = argparse.ArgumentParser(description="Filter and validate pinned Python packages.")
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Ignore cached feedstock meta.yaml files and fetch them again')
+    args = parser.parse_args()
+
     repo_root = Path(__file__).parent.parent.parent
     pinned_file = repo_root / "reproducibility" / "packages-python-pinned.yaml"
     log_file = repo_root / "reproducibility" / "build.log"
@@ -358,7 +360,7 @@ def main():
     
     # Parse py-rocket-base environment.yaml
     print("Parsing py-rocket-base environment.yaml...")
-    pangeo_notebook_set, pangeo_dask_set, other_base_set = parse_base_environment(base_env_file)
+    pangeo_notebook_set, pangeo_dask_set, other_base_set = parse_base_environment(base_env_file, use_cache=not args.no_cache)
     all_base_packages = pangeo_notebook_set | pangeo_dask_set | other_base_set
     print(f"Found {len(pangeo_notebook_set)} packages from pangeo-notebook feedstock")
     print(f"Found {len(pangeo_dask_set)} packages from pangeo-dask feedstock")
@@ -390,40 +392,30 @@ def main():
     all_pinned_packages, header_lines = read_pinned_packages(pinned_file)
     print(f"Found {len(all_pinned_packages)} total pinned packages")
     
+    pinned_names = all_pinned_packages.keys()
+    
     # Filter to packages from pangeo-notebook feedstock
-    pangeo_notebook_filtered = {}
-    for pkg_name in pangeo_notebook_set:
-        if pkg_name in all_pinned_packages:
-            pangeo_notebook_filtered[pkg_name] = all_pinned_packages[pkg_name]
+    pangeo_notebook_filtered = {k: all_pinned_packages[k] for k in pangeo_notebook_set & pinned_names}
     
     print(f"Filtered to {len(pangeo_notebook_filtered)} packages from pangeo-notebook feedstock")
     
     # Filter to packages from pangeo-dask feedstock
-    pangeo_dask_filtered = {}
-    for pkg_name in pangeo_dask_set:
-        if pkg_name in all_pinned_packages:
-            pangeo_dask_filtered[pkg_name] = all_pinned_packages[pkg_name]
+    pangeo_dask_filtered = {k: all_pinned_packages[k] for k in pangeo_dask_set & pinned_names}
     
     print(f"Filtered to {len(pangeo_dask_filtered)} packages from pangeo-dask feedstock")
     
     # Filter to other packages from py-rocket-base
-    other_base_filtered = {}
-    for pkg_name in other_base_set:
-        if pkg_name in all_pinned_packages:
-            other_base_filtered[pkg_name] = all_pinned_packages[pkg_name]
+    other_base_filtered = {k: all_pinned_packages[k] for k in other_base_set & pinned_names}
     
     print(f"Filtered to {len(other_base_filtered)} other packages from py-rocket-base")
     
     # Filter to packages from env files
-    env_filtered = {}
-    for pkg_name in all_env_packages:
-        if pkg_name in all_pinned_packages:
-            env_filtered[pkg_name] = all_pinned_packages[pkg_name]
+    env_filtered = {k: all_pinned_packages[k] for k in all_env_packages & pinned_names}
     
     print(f"Filtered to {len(env_filtered)} packages from env files")
     
     # Find missing packages
-    all_filtered = set(pangeo_notebook_filtered.keys()) | set(pangeo_dask_filtered.keys()) | set(other_base_filtered.keys()) | set(env_filtered.keys())
+    all_filtered = all_target_packages & pinned_names
     missing_packages = all_target_packages - all_filtered
     
     # Write filtered packages back
@@ -25,6 +25,23 @@ ARCHIVED_PACKAGES = {
     'rgeos',         # Archived in 2023
 }
 
+# Patterns for package references in install.R, rocker scripts and packages-r-pinned.R
+# c("pkg1", "pkg2", ...) vectors, and the quoted names inside them
+_VECTOR_START_RE = re.compile(r'c\s*\(')
+# String literals and comments (skipped when counting parens) and parens
+_R_TOKEN_RE = re.compile(r'"(?:[^"\\]|\\.)*"|\'(?:[^\'\\]|\\.)*\'|#[^\n]*|[()]')
+# Vector body up to the first ')', for a c( whose parens never balance
+_VECTOR_BODY_RE = re.compile(r'[^)]+(?=\))')
+_QUOTED_RE = re.compile(r'["\']([^"\']+)["\']')
+# remotes::install_github("user/repo", ...)
+_GITHUB_RE = re.compile(r'remotes::install_github\s*\(\s*["\']([^/]+)/([^"\'@]+)')
+# remotes::install_version("package", ...)
+_VERSION_RE = re.compile(r'remotes::install_version\s*\(\s*["\']([^"\']+)["\']')
+# BiocManager::install("package")
+_BIOC_RE = re.compile(r'BiocManager::install\s*\(\s*["\']([^"\']+)["\']')
+# Start of a command that ends an install2.r package list (R, apt-get/apt, set, export, echo)
+_STOP_RE = re.compile(r'R[ \t]|apt[- ]|set |export |echo ')
+
 
 def parse_install_r(install_r_path: Path) -> Set[str]:
     """
@@ -34,25 +51,44 @@ def parse_install_r(install_r_path: Path) -> Set[str]:
         Set of package names
     """
     packages = set()
+    content = install_r_path.read_text()
     
-    with open(install_r_path, 'r') as f:
-        content = f.read()
+    # Find install.packages() calls with vectors
+    # e.g., list.of.packages <- c("quarto", "reticulate", ...)
+    # Each c( is matched to its closing paren by counting parens outside
+    # strings and comments, so nested calls do not cut the vector short.
+    pos = 0
+    while True:
+        start_match = _VECTOR_START_RE.search(content, pos)
+        if not start_match:
+            break
+        start = start_match.end()
+        end = None
+        depth = 1
+        for token in _R_TOKEN_RE.finditer(content, start):
+            paren = token.group()
+            if paren == '(':
+                depth += 1
+            elif paren == ')':
+                depth -= 1
+                if depth == 0:
+                    end = token.start()
+                    pos = token.end()
+                    break
         
-        # Find install.packages() calls with vectors
-        # e.g., list.of.packages <- c("quarto", "reticulate", ...)
-        vector_pattern = r'c\s*\(\s*([^)]+)\s*\)'
-        for match in re.finditer(vector_pattern, content):
-            vector_content = match.group(1)
-            # Extract quoted package names
-            pkg_names = re.findall(r'["\']([^"\']+)["\']', vector_content)
-            packages.update(pkg_names)
+        if end is None:
+            # Unbalanced vector; read up to the first ')' and keep scanning
+            body_match = _VECTOR_BODY_RE.match(content, start)
+            end = pos = body_match.end() if body_match else start
         
-        # Find remotes::install_github() calls
-        # e.g., remotes::install_github("hvillalo/echogram", ...)
-        github_pattern = r'remotes::install_github\s*\(\s*["\']([^/]+)/([^"\'@]+)'
-        for match in re.finditer(github_pattern, content):
-            repo_name = match.group(2)
-            packages.add(repo_name)
+        # Extract quoted package names
+        packages.update(_QUOTED_RE.findall(content, start, end))
+    
+    # Find remotes::install_github() calls
+    # e.g., remotes::install_github("hvillalo/echogram", ...)
+    for match in _GITHUB_RE.finditer(content):
+        repo_name = match.group(2)
+        packages.add(repo_name)
     
     return packages
 
@@ -68,10 +104,18 @@ def parse_install_geospatial_content(script_content: str) -> Set[str]:
     
     # Find install2.r commands
     # The install2.r command spans multiple lines with backslash continuation
-    lines = script_content.split('\n')
+    # Walk the script line by line without building a list of all lines
     in_install2r = False
+    pos = 0
+    end = len(script_content)
     
-    for line in lines:
+    while pos < end:
+        nl = script_content.find('\n', pos)
+        if nl == -1:
+            nl = end
+        line = script_content[pos:nl]
+        pos = nl + 1
+        
         # Check if this line starts install2.r command
         if 'install2.r' in line and not line.strip().startswith('#'):
             in_install2r = True
@@ -92,7 +136,7 @@ def parse_install_geospatial_content(script_content: str) -> Set[str]:
             if pkg_name and not pkg_name.startswith('-') and not pkg_name.startswith('$'):
                 # Stop if we hit something that looks like a new command (check at start of line)
                 # 'apt-' for apt-get, 'apt ' for apt install, etc.
-                if any(pkg_name.startswith(cmd) for cmd in ['R ', 'R\t', 'apt-', 'apt ', 'set ', 'export ', 'echo ']):
+                if _STOP_RE.match(pkg_name):
                     in_install2r = False
                     continue
                 packages.add(pkg_name)
@@ -103,8 +147,7 @@ def parse_install_geospatial_content(script_content: str) -> Set[str]:
     
     # Find BiocManager::install() calls
     # e.g., R -e "BiocManager::install('rhdf5')"
-    bioc_pattern = r'BiocManager::install\s*\(\s*["\']([^"\']+)["\']'
-    for match in re.finditer(bioc_pattern, script_content):
+    for match in _BIOC_RE.finditer(script_content):
         packages.add(match.group(1))
     
     return packages
@@ -119,31 +162,24 @@ def read_pinned_packages(pinned_file: Path) -> Set[str]:
     """
     packages = set()
     
-    with open(pinned_file, 'r') as f:
-        for line in f:
-            stripped = line.strip()
-            
-            # Skip comments and empty lines
-            if stripped.startswith('#') or not stripped:
-                continue
-            
-            # Match remotes::install_version("package", ...)
-            version_match = re.match(
-                r'remotes::install_version\s*\(\s*["\']([^"\']+)["\']',
-                stripped
-            )
-            if version_match:
-                packages.add(version_match.group(1))
-                continue
-            
-            # Match remotes::install_github("user/repo", ...)
-            github_match = re.match(
-                r'remotes::install_github\s*\(\s*["\']([^/]+)/([^"\'@]+)',
-                stripped
-            )
-            if github_match:
-                packages.add(github_match.group(2))
-                continue
+    for line in pinned_file.read_text(encoding='utf-8').splitlines():
+        stripped = line.strip()
+        
+        # Skip comments and empty lines
+        if stripped.startswith('#') or not stripped:
+            continue
+        
+        # Match remotes::install_version("package", ...)
+        version_match = _VERSION_RE.match(stripped)
+        if version_match:
+            packages.add(version_match.group(1))
+            continue
+        
+        # Match remotes::install_github("user/repo", ...)
+        github_match = _GITHUB_RE.match(stripped)
+        if github_match:
+            packages.add(github_match.group(2))
+            continue
     
     return packages
 
@@ -155,69 +191,68 @@ def append_to_build_log(log_file: Path, success: bool, missing_packages: Set[str
     """
     Append R package validation results to build.log.
     """
-    with open(log_file, 'a') as f:
-        f.write("\n\n")
-        f.write("=" * 70 + "\n")
-        f.write("R Package Validation Report\n")
-        f.write("=" * 70 + "\n\n")
-        
-        f.write(f"Packages in install.R: {len(install_r_packages)}\n")
-        f.write(f"Packages in /rocker_scripts/install_geospatial.sh: {len(geospatial_packages)}\n")
-        f.write(f"Packages in /rocker_scripts/install_tidyverse.sh: {len(tidyverse_packages)}\n")
-        f.write(f"Total unique R packages expected: {total_expected}\n")
+    # Where each package can come from, in report order
+    package_sources = (
+        ("install.R", install_r_packages),
+        ("install_geospatial.sh", geospatial_packages),
+        ("install_tidyverse.sh", tidyverse_packages),
+    )
+    
+    # Build the whole report in memory and append it with one write
+    parts = []
+    parts.append("\n\n")
+    parts.append("=" * 70 + "\n")
+    parts.append("R Package Validation Report\n")
+    parts.append("=" * 70 + "\n\n")
+    
+    parts.append(f"Packages in install.R: {len(install_r_packages)}\n")
+    parts.append(f"Packages in /rocker_scripts/install_geospatial.sh: {len(geospatial_packages)}\n")
+    parts.append(f"Packages in /rocker_scripts/install_tidyverse.sh: {len(tidyverse_packages)}\n")
+    parts.append(f"Total unique R packages expected: {total_expected}\n")
+    
+    if excluded_packages:
+        parts.append(f"Archived packages excluded from validation: {len(excluded_packages)}\n")
+        parts.append(f"  ({', '.join(sorted(excluded_packages))})\n")
+    
+    parts.append(f"Total packages in packages-r-pinned.R: {total_pinned}\n\n")
+    
+    if success:
+        parts.append("STATUS: SUCCESS\n")
+        parts.append("=" * 70 + "\n\n")
+        parts.append("All R packages from install.R, install_geospatial.sh, and\n")
+        parts.append("install_tidyverse.sh are present in packages-r-pinned.R.\n\n")
+        parts.append("The packages-r-pinned.R file contains all required packages\n")
+        parts.append("from the custom install.R and the rocker scripts.\n")
         
         if excluded_packages:
-            f.write(f"Archived packages excluded from validation: {len(excluded_packages)}\n")
-            f.write(f"  ({', '.join(sorted(excluded_packages))})\n")
-        
-        f.write(f"Total packages in packages-r-pinned.R: {total_pinned}\n\n")
+            parts.append("\nNote: The following archived packages were excluded from validation\n")
+            parts.append("as they are no longer available on CRAN:\n")
+            for pkg in sorted(excluded_packages):
+                sources = [name for name, pkgs in package_sources if pkg in pkgs]
+                parts.append(f"  - {pkg} (found in: {', '.join(sources)})\n")
+    else:
+        parts.append("STATUS: FAILED\n")
+        parts.append("=" * 70 + "\n\n")
+        parts.append("The following R packages are specified in install.R,\n")
+        parts.append("install_geospatial.sh, or install_tidyverse.sh but were NOT\n")
+        parts.append("found in packages-r-pinned.R:\n\n")
         
-        if success:
-            f.write("STATUS: SUCCESS\n")
-            f.write("=" * 70 + "\n\n")
-            f.write("All R packages from install.R, install_geospatial.sh, and\n")
-            f.write("install_tidyverse.sh are present in packages-r-pinned.R.\n\n")
-            f.write("The packages-r-pinned.R file contains all required packages\n")
-            f.write("from the custom install.R and the rocker scripts.\n")
-            
-            if excluded_packages:
-                f.write("\nNote: The following archived packages were excluded from validation\n")
-                f.write("as they are no longer available on CRAN:\n")
-                for pkg in sorted(excluded_packages):
-                    sources = []
-                    if pkg in install_r_packages:
-                        sources.append("install.R")
-                    if pkg in geospatial_packages:
-                        sources.append("install_geospatial.sh")
-                    if pkg in tidyverse_packages:
-                        sources.append("install_tidyverse.sh")
-                    f.write(f"  - {pkg} (found in: {', '.join(sources)})\n")
-        else:
-            f.write("STATUS: FAILED\n")
-            f.write("=" * 70 + "\n\n")
-            f.write("The following R packages are specified in install.R,\n")
-            f.write("install_geospatial.sh, or install_tidyverse.sh but were NOT\n")
-            f.write("found in packages-r-pinned.R:\n\n")
-            
-            for pkg in sorted(missing_packages):
-                sources = []
-                if pkg in install_r_packages:
-                    sources.append("install.R")
-                if pkg in geospatial_packages:
-                    sources.append("install_geospatial.sh")
-                if pkg in tidyverse_packages:
-                    sources.append("install_tidyverse.sh")
-                f.write(f"  - {pkg}\n")
-                f.write(f"    Found in: {', '.join(sources)}\n")
-            
-            f.write(f"\nTotal missing packages: {len(missing_packages)}\n\n")
-            f.write("To resolve this issue:\n")
-            f.write("  1. Check if these packages failed to install in the container\n")
-            f.write("  2. Review the container build logs for errors\n")
-            f.write("  3. Fix any installation issues and rebuild the container\n")
-            f.write("  4. Re-run the pin-packages workflow to update packages-r-pinned.R\n")
+        for pkg in sorted(missing_packages):
+            sources = [name for name, pkgs in package_sources if pkg in pkgs]
+            parts.append(f"  - {pkg}\n")
+            parts.append(f"    Found in: {', '.join(sources)}\n")
         
-        f.write("\n" + "=" * 70 + "\n")
+        parts.append(f"\nTotal missing packages: {len(missing_packages)}\n\n")
+        parts.append("To resolve this issue:\n")
+        parts.append("  1. Check if these packages failed to install in the container\n")
+        parts.append("  2. Review the container build logs for errors\n")
+        parts.append("  3. Fix any installation issues and rebuild the container\n")
+        parts.append("  4. Re-run the pin-packages workflow to update packages-r-pinned.R\n")
+    
+    parts.append("\n" + "=" * 70 + "\n")
+    
+    with open(log_file, 'a') as f:
+        f.write(''.join(parts))
 
 
 def main():